@@ -10,7 +10,10 @@ Target: TOI 864.01 (TIC 231728511)
 
 import lightkurve as lk
 import numpy as np
+import bottleneck as bn
 import matplotlib.pyplot as plt
+from astropy.timeseries import BoxLeastSquares
+from pipeline_utils import read_cached_lightcurve, save_cached_lightcurve, bin_phase_curve
 
 # --- 1. CONFIGURATION ---
 TIC_ID = "TIC 231728511"
@@ -20,31 +23,78 @@ TOI_ID = "TOI 864.01"
 PERIOD_HINT = 0.523 
 DURATION_HOURS_HINT = 1.0 
 
-print(f"🔬 STARTING SCIENTIFIC ANALYSIS FOR {TOI_ID} ({TIC_ID})")
-print("---------------------------------------------------------")
+# Period grid density: the transit may drift by at most duration/GRID_OVERSAMPLE
+# across the full multi-sector baseline between two neighbouring trial periods.
+GRID_OVERSAMPLE = 3
+
+# Savitzky-Golay window (cadences) used to flatten the light curve.
+# NOTE: This window sets the transit-depth attenuation reported in the paper.
+FLATTEN_WINDOW = 501
+
+# Cache names in 'data/' (only SPOC 2-min light curves are cached)
+SPOC_CACHE_NAME = "TIC_231728511_SPOC_120s"
+FLAT_CACHE_NAME = f"{SPOC_CACHE_NAME}_flat{FLATTEN_WINDOW}"
+
+def download_lightcurve():
+    """
+    Downloads and stitches the best available cadence (SPOC 2-min > TESS-SPOC > QLP).
+    Returns (light curve, is_spoc_120s).
+    """
+    # A single MAST query; the fallbacks below only filter its result locally
+    search_all = lk.search_lightcurve(TIC_ID)
 
-# --- 2. DATA DOWNLOAD AND PROCESSING ---
-print("📡 Connecting to MAST servers...")
-try:
     # Attempt to download SPOC data (High Quality, 2-min cadence)
-    search = lk.search_lightcurve(TIC_ID, author="SPOC", exptime=120)
+    search = search_all[(search_all.author == "SPOC") & (search_all.exptime.value == 120)]
+    is_spoc_120s = len(search) > 0
     if len(search) == 0:
         # Fallback to TESS-SPOC
-        search = lk.search_lightcurve(TIC_ID, author="TESS-SPOC")
+        search = search_all[search_all.author == "TESS-SPOC"]
     
     if len(search) == 0:
         print("❌ High cadence data not found. Trying QLP data...")
-        search = lk.search_lightcurve(TIC_ID, author="QLP")
+        search = search_all[search_all.author == "QLP"]
 
     print(f"   Sectors found: {len(search)}")
-    lc_collection = search.download_all()
-    
+    return search.download_all().stitch(), is_spoc_120s
+
+def process_lightcurve(lc_stitched):
+    """Stitched light curve -> cleaned and flattened light curve."""
     # Processing steps:
     # 1. Stitch: Merge all sectors.
     # 2. Remove Outliers: Sigma clipping (sigma=5).
     # 3. Flatten: Remove stellar variability.
     print("⚙️  Processing, cleaning, and flattening light curve...")
-    lc_combined = lc_collection.stitch().remove_nans().remove_outliers(sigma=5).flatten(window_length=501)
+    return lc_stitched.remove_nans().remove_outliers(sigma=5).flatten(window_length=FLATTEN_WINDOW)
+
+def load_lightcurve():
+    """
+    Flattened light curve. The stitched and the flattened SPOC 2-min light curves are
+    read from 'data/' once cached; fallback (TESS-SPOC/QLP) data are not cached, so
+    the SPOC 2-min data are used as soon as they become available.
+    """
+    lc_combined = read_cached_lightcurve(FLAT_CACHE_NAME)
+    if lc_combined is not None:
+        return lc_combined
+
+    lc_stitched = read_cached_lightcurve(SPOC_CACHE_NAME)
+    is_spoc_120s = lc_stitched is not None
+    if lc_stitched is None:
+        lc_stitched, is_spoc_120s = download_lightcurve()
+        if is_spoc_120s:
+            save_cached_lightcurve(SPOC_CACHE_NAME, lc_stitched)
+
+    lc_combined = process_lightcurve(lc_stitched)
+    if is_spoc_120s:
+        save_cached_lightcurve(FLAT_CACHE_NAME, lc_combined)
+    return lc_combined
+
+print(f"🔬 STARTING SCIENTIFIC ANALYSIS FOR {TOI_ID} ({TIC_ID})")
+print("---------------------------------------------------------")
+
+# --- 2. DATA DOWNLOAD AND PROCESSING ---
+print("📡 Connecting to MAST servers...")
+try:
+    lc_combined = load_lightcurve()
     print("✅ Data ready for analysis.")
 
 except Exception as e:
@@ -55,16 +105,31 @@ except Exception as e:
 print("\n🔍 Initiating automatic signal search (BLS)...")
 print("   Scanning period grid...")
 
-# Define high-resolution grid
-period_grid = np.linspace(PERIOD_HINT - 0.01, PERIOD_HINT + 0.01, 10000)
-
-# Execute BLS
-bls = lc_combined.to_periodogram(method='bls', period=period_grid, duration=DURATION_HOURS_HINT/24)
+# Define the grid: uniform in frequency, with the step set by the transit duration
+# and the data baseline. (astropy's autoperiod() rule, df = duration / baseline**2,
+# would need ~10^6 trials for a multi-year baseline.)
+time_vals = lc_combined.time.value
+baseline = np.ptp(time_vals)
+duration_days = DURATION_HOURS_HINT / 24
+period_min, period_max = PERIOD_HINT - 0.01, PERIOD_HINT + 0.01
+freq_step = duration_days / (GRID_OVERSAMPLE * baseline * period_max)
+period_grid = np.sort(1 / np.arange(1 / period_max, 1 / period_min, freq_step))
+print(f"   Trial periods: {len(period_grid)} (baseline {baseline:.0f} days)")
+
+# Execute BLS directly on the plain arrays (BTJD times, normalized flux).
+# This skips the Time/Quantity wrapping done by lc.to_periodogram().
+# As in lc.to_periodogram(), the errors are only used when all of them are finite
+# (a single NaN error would turn every BLS power into NaN).
+flux_err_vals = lc_combined.flux_err.value
+bls_dy = flux_err_vals if np.isfinite(flux_err_vals).all() else None
+bls = BoxLeastSquares(time_vals, lc_combined.flux.value, dy=bls_dy)
+bls_result = bls.power(period_grid, duration_days)
 
 # Extract best-fit parameters
-best_period = bls.period_at_max_power.value
-best_t0 = bls.transit_time_at_max_power.value
-best_depth = bls.depth_at_max_power.value
+best_index = np.argmax(bls_result.power)
+best_period = bls_result.period[best_index]
+best_t0 = bls_result.transit_time[best_index]
+best_depth = bls_result.depth[best_index]
 
 print(f"🎯 SYNCHRONIZATION COMPLETE:")
 print(f"   Detected Period: {best_period:.6f} days")
@@ -75,17 +140,21 @@ print(f"   Detected Epoch (T0): {best_t0:.4f} BTJD")
 lc_folded = lc_combined.fold(period=best_period, epoch_time=best_t0)
 
 # Masks for In-Transit vs Out-of-Transit
+# |phase| is computed once and shared by both masks.
 duration_phase = (DURATION_HOURS_HINT / 24) / best_period
-mask_transit = (np.abs(lc_folded.phase.value) < (duration_phase * 0.5))
-mask_out = (np.abs(lc_folded.phase.value) > (duration_phase * 2.0))
+abs_phase = np.abs(lc_folded.phase.value)
+mask_transit = (abs_phase < (duration_phase * 0.5))
+mask_out = (abs_phase > (duration_phase * 2.0))
 
-# Flux extraction
-flux_in = lc_folded.flux[mask_transit]
-flux_out = lc_folded.flux[mask_out]
+# Flux extraction (plain float array, so depth/noise/SNR below are plain floats)
+flux_vals = np.asarray(lc_folded.flux.value)
+flux_in = flux_vals[mask_transit]
+flux_out = flux_vals[mask_out]
 
 # Calculate depth and noise in ppm
-depth_ppm = (np.nanmedian(flux_out) - np.nanmedian(flux_in)) * 1e6
-noise_ppm = np.nanstd(flux_out) * 1e6
+# (bottleneck's NaN-aware reductions are faster than numpy's nanmedian/nanstd)
+depth_ppm = (bn.nanmedian(flux_out) - bn.nanmedian(flux_in)) * 1e6
+noise_ppm = bn.nanstd(flux_out) * 1e6
 n_points = len(flux_in)
 
 # Calculate SNR
@@ -96,7 +165,8 @@ fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6), sharey=True)
 
 # PLOT 1: Primary Transit
 lc_folded.scatter(ax=ax1, color='black', alpha=0.1, s=1, label='Raw Data')
-lc_folded.bin(time_bin_size=0.005).plot(ax=ax1, color='red', lw=2, label='Model (Smoothed)')
+bin_phase, bin_flux, _ = bin_phase_curve(lc_folded.phase.value, flux_vals, bin_size=0.005)
+ax1.plot(bin_phase, bin_flux, color='red', lw=2, label='Model (Smoothed)')
 ax1.set_title(f'TRANSIT DETECTED\nPeriod: {best_period:.5f} d', fontsize=12, fontweight='bold')
 ax1.set_xlim(-0.15, 0.15)
 ax1.set_xlabel('Phase [days]')
@@ -105,9 +175,11 @@ ax1.legend(loc='lower left')
 ax1.grid(True, alpha=0.3)
 
 # PLOT 2: Secondary Eclipse Check (Phase 0.5)
-lc_folded_sec = lc_combined.fold(period=best_period, epoch_time=best_t0 + (best_period/2))
-lc_folded_sec.scatter(ax=ax2, color='blue', alpha=0.1, s=1, label='Phase 0.5 Data')
-lc_folded_sec.bin(time_bin_size=0.005).plot(ax=ax2, color='orange', lw=2, label='Mean Flux')
+# Re-use the primary fold: moving the epoch by P/2 maps phase -> (phase mod P) - P/2
+phase_sec = np.mod(lc_folded.phase.value, best_period) - 0.5 * best_period
+bin_phase_sec, bin_flux_sec, _ = bin_phase_curve(phase_sec, flux_vals, bin_size=0.005)
+ax2.scatter(phase_sec, flux_vals, color='blue', alpha=0.1, s=1, label='Phase 0.5 Data')
+ax2.plot(bin_phase_sec, bin_flux_sec, color='orange', lw=2, label='Mean Flux')
 
 ax2.set_title(f'SECONDARY ECLIPSE CHECK (Phase 0.5)', fontsize=12, fontweight='bold')
 ax2.set_xlim(-0.15, 0.15)
@@ -124,16 +196,16 @@ print("\n" + "="*50)
 print(f"📊 FINAL DETECTION REPORT: {TOI_ID}")
 print("="*50)
 
-print(f"1. Measured Depth:    {float(depth_ppm.value):.2f} ppm")
-print(f"2. Background Noise:  {float(noise_ppm.value):.2f} ppm")
+print(f"1. Measured Depth:    {depth_ppm:.2f} ppm")
+print(f"2. Background Noise:  {noise_ppm:.2f} ppm")
 print("-" * 30)
-print(f"3. SNR (Signal/Noise): {float(snr_final.value):.2f}")
+print(f"3. SNR (Signal/Noise): {snr_final:.2f}")
 print("-" * 30)
 
 print("INTERPRETATION:")
-if snr_final.value > 7.1:
+if snr_final > 7.1:
     print("✅ SUCCESS: SNR > 7.1. Robust detection confirmed.")
-    if abs(depth_ppm.value) < 500:
+    if abs(depth_ppm) < 500:
         print("   NOTE: Small depth (<500 ppm) observed, compatible with Earth/Super-Earth.")
 else:
     print("⚠️ WARNING: Low SNR. Signal cannot be clearly confirmed.")
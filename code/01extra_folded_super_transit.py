@@ -19,10 +19,9 @@ Author: Biel Escolà Rodrigo
 Target: TIC 231728511 (TOI 864.01)
 """
 
-import lightkurve as lk
 import matplotlib.pyplot as plt
 import numpy as np
-import astropy.units as u
+from pipeline_utils import load_spoc_lightcurve, bin_phase_curve
 
 # --- 1. CONFIGURATION ---
 TIC_ID = "TIC 231728511"
@@ -33,10 +32,9 @@ BIN_SIZE_MINS = 10     # Bin size in minutes (Controls data density)
 print(f"📥 Downloading data for {TIC_ID}...")
 
 # --- 2. DATA PROCESSING ---
-# Download all available sectors. 
+# Download all available sectors (cached in 'data/' after the first run).
 # We prioritize SPOC author for the highest quality reduction.
-search = lk.search_lightcurve(TIC_ID, mission="TESS", author="SPOC")
-lc = search.download_all().stitch()
+lc = load_spoc_lightcurve(TIC_ID)
 
 # Basic cleaning: 
 # - remove_nans: Handle missing data.
@@ -51,8 +49,13 @@ folded_lc = lc_clean.fold(period=PERIOD, epoch_time=T0)
 
 print("📊 Binning data...")
 # Binning is essential to visualize the "average" transit shape amidst the noise.
-# This calculates the mean flux and error for each time bin.
-binned_lc = folded_lc.bin(time_bin_size=BIN_SIZE_MINS * u.min)
+# This calculates the mean flux and error for each time bin (vectorized NumPy binning).
+bin_time, bin_flux, bin_flux_err = bin_phase_curve(
+    folded_lc.time.value,
+    folded_lc.flux.value,
+    folded_lc.flux_err.value,
+    bin_size=BIN_SIZE_MINS / 1440,  # minutes -> days
+)
 
 # --- 3. PLOTTING (RNAAS Style) ---
 print("🎨 Generating plot...")
@@ -60,9 +63,9 @@ plt.figure(figsize=(10, 6))
 
 # Plotting with error bars to show statistical significance
 plt.errorbar(
-    binned_lc.time.value,      # X-Axis: Phase (days)
-    binned_lc.flux.value,      # Y-Axis: Normalized Flux
-    yerr=binned_lc.flux_err.value, # Error bars derived from binning
+    bin_time,                  # X-Axis: Phase (days)
+    bin_flux,                  # Y-Axis: Normalized Flux
+    yerr=bin_flux_err,         # Error bars derived from binning
     fmt='o',                   # Format: circle markers
     color='steelblue',         # Aesthetic choice matching paper style
     alpha=0.7,                 # Slight transparency for overlapping points
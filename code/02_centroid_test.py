@@ -11,6 +11,7 @@ Target: TOI 864.01
 import lightkurve as lk
 import matplotlib.pyplot as plt
 import numpy as np
+from pipeline_utils import bin_phase_curve, load_cached_targetpixelfile
 
 # --- CONFIGURATION ---
 TIC_ID = "TIC 231728511"
@@ -21,8 +22,11 @@ print(f"🕵️‍♀️ STARTING CENTROID TEST FOR {TIC_ID}")
 
 try:
     print("📡 Downloading Sector 27 Target Pixel File (TPF)...")
-    # Using Sector 27 as reference
-    tpf = lk.search_targetpixelfile(TIC_ID, author="SPOC", sector=27).download()
+    # Using Sector 27 as reference (downloaded once, then read from the local 'data/' cache)
+    tpf = load_cached_targetpixelfile(
+        "TIC_231728511_SPOC_S27",
+        lambda: lk.search_targetpixelfile(TIC_ID, author="SPOC", sector=27).download(),
+    )
     
     if tpf is None:
         print("❌ Could not download TPF. Exiting.")
@@ -30,35 +34,35 @@ try:
 
     print("⚙️  Calculating center of light (Centroids)...")
     
-    # 1. Create light curve
-    lc = tpf.to_lightcurve(aperture_mask=tpf.pipeline_mask).remove_nans().flatten()
+    # 1. Time of every TPF cadence (BTJD)
+    time = tpf.time.value
     
     # 2. Calculate X/Y positions
     centroids = tpf.estimate_centroids()
     centroid_col = centroids[0].value # X
     centroid_row = centroids[1].value # Y
     
-    # 3. Create LightCurves for position
-    lc_centroid_col = lk.LightCurve(time=lc.time, flux=centroid_col)
-    folded_col = lc_centroid_col.fold(period=KNOWN_PERIOD, epoch_time=KNOWN_T0)
-    
-    lc_centroid_row = lk.LightCurve(time=lc.time, flux=centroid_row)
-    folded_row = lc_centroid_row.fold(period=KNOWN_PERIOD, epoch_time=KNOWN_T0)
+    # 3. Phase-fold once (days from mid-transit), shared by both axes
+    phase = ((time - KNOWN_T0 + 0.5 * KNOWN_PERIOD) % KNOWN_PERIOD) - 0.5 * KNOWN_PERIOD
+    bin_phase_col, bin_col, _ = bin_phase_curve(phase, centroid_col, bin_size=0.01)
+    bin_phase_row, bin_row, _ = bin_phase_curve(phase, centroid_row, bin_size=0.01)
     
     # --- VISUALIZATION ---
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
     
     # GRAPH 1: X Axis
-    folded_col.scatter(ax=ax1, s=1, alpha=0.3, c='gray')
-    folded_col.bin(time_bin_size=0.01).plot(ax=ax1, c='red', lw=3, label='Mean Movement')
+    ax1.scatter(phase, centroid_col, s=1, alpha=0.3, c='gray')
+    ax1.plot(bin_phase_col, bin_col, c='red', lw=3, label='Mean Movement')
     ax1.set_title("Centroid Movement (X Axis - Columns)", fontsize=12, fontweight='bold')
+    ax1.set_xlabel("Phase [days]")
     ax1.set_ylabel("Pixels")
     ax1.set_xlim(-0.1, 0.1) 
     
     # GRAPH 2: Y Axis
-    folded_row.scatter(ax=ax2, s=1, alpha=0.3, c='gray')
-    folded_row.bin(time_bin_size=0.01).plot(ax=ax2, c='blue', lw=3, label='Mean Movement')
+    ax2.scatter(phase, centroid_row, s=1, alpha=0.3, c='gray')
+    ax2.plot(bin_phase_row, bin_row, c='blue', lw=3, label='Mean Movement')
     ax2.set_title("Centroid Movement (Y Axis - Rows)", fontsize=12, fontweight='bold')
+    ax2.set_xlabel("Phase [days]")
     ax2.set_ylabel("Pixels")
     ax2.set_xlim(-0.1, 0.1)
 
@@ -19,7 +19,9 @@ Target: TIC 231728511
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor
 from lightkurve import search_lightcurve, LightCurveCollection
+from pipeline_utils import load_cached_lightcurve, bin_phase_curve
 
 # --- 1. CONFIGURATION ---
 TIC_ID = 231728511
@@ -29,43 +31,62 @@ T0 = 1411.1454  # Epoch (BTJD) - Converted from BJD if necessary
 # List of sectors with confirmed data availability
 SECTORS_LIST = [4, 5, 6, 27, 31, 32, 33, 37, 64, 67, 87, 94]
 
-print(f"🚀 Starting download and stitching for {len(SECTORS_LIST)} sectors...")
-
-lc_list = []
+# Parallel downloads (network-bound). MAST throttles beyond a few connections.
+MAX_DOWNLOAD_WORKERS = 8
 
 # --- 2. DATA RETRIEVAL LOOP ---
-for sector in SECTORS_LIST:
+def fetch_sector(search_row, sector):
+    """Downloads and cleans a single sector. Returns None if it cannot be used."""
     try:
-        # Search for light curves (Mission: TESS)
-        search = search_lightcurve(f"TIC {TIC_ID}", mission="TESS", sector=sector)
-        if len(search) == 0: continue
-            
-        # Prioritize SPOC (Science Processing Operations Center) data 
-        # as it is the official high-fidelity NASA pipeline.
-        if "SPOC" in search.author:
-            lc_file = search[search.author == "SPOC"][0].download()
-        else:
-            # Fallback to whatever is available (e.g., QLP, TESS-SPOC)
-            lc_file = search[0].download()
-            
-        if lc_file is None: continue
+        lc_file = search_row.download()
+        if lc_file is None: return None
 
         # Basic cleaning for each sector
         # - remove_nans: Remove empty values
         # - normalize: Put flux on relative scale (around 1.0)
         # - remove_outliers: Remove cosmic rays (5 sigma)
         lc_clean = lc_file.remove_nans().normalize().remove_outliers(sigma=5)
-        lc_list.append(lc_clean)
         
         print(f"   ✅ Sector {sector} added.")
+        return lc_clean
         
     except Exception as e:
         print(f"   ⚠️ Error processing Sector {sector}: {e}")
-
-# --- 3. STITCHING ---
-print("🧵 Stitching all sectors into a single light curve...")
-lc_collection = LightCurveCollection(lc_list)
-lc_stitched = lc_collection.stitch() # Normalizes and merges all sectors
+        return None
+
+def download_sectors():
+    """Downloads, cleans and stitches the light curve of every sector in SECTORS_LIST."""
+    print(f"🚀 Starting download and stitching for {len(SECTORS_LIST)} sectors...")
+
+    # A single MAST query covering all the sectors
+    search = search_lightcurve(f"TIC {TIC_ID}", mission="TESS", sector=SECTORS_LIST)
+    search_sectors = np.asarray(search.table["sequence_number"])
+
+    # Pick one file per sector.
+    # Prioritize SPOC (Science Processing Operations Center) data 
+    # as it is the official high-fidelity NASA pipeline.
+    selected = []
+    for sector in SECTORS_LIST:
+        rows = np.flatnonzero(search_sectors == sector)
+        if len(rows) == 0: continue
+
+        spoc_rows = [i for i in rows if search.author[i] == "SPOC"]
+        # Fallback to whatever is available (e.g., QLP, TESS-SPOC)
+        selected.append(spoc_rows[0] if spoc_rows else rows[0])
+
+    # Download the selected sectors concurrently (results keep the SECTORS_LIST order)
+    with ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS) as executor:
+        lc_list = list(executor.map(fetch_sector, [search[i] for i in selected], search_sectors[selected]))
+    lc_list = [lc for lc in lc_list if lc is not None]
+
+    # --- 3. STITCHING ---
+    print("🧵 Stitching all sectors into a single light curve...")
+    lc_collection = LightCurveCollection(lc_list)
+    return lc_collection.stitch() # Normalizes and merges all sectors
+
+# The stitched light curve is built once and then read from the local 'data/' cache.
+# The cache name lists the sectors, so editing SECTORS_LIST triggers a new download.
+lc_stitched = load_cached_lightcurve(f"TIC_{TIC_ID}_S" + "_".join(map(str, SECTORS_LIST)), download_sectors)
 
 # --- 4. FOLDING AND BINNING ---
 print("🔄 Folding and binning the combined light curve...")
@@ -78,14 +99,18 @@ lc_folded_raw = lc_stitched.fold(period=P_ORB, epoch_time=T0)
 # With 12 sectors, the raw data is too dense and noisy for rapid statistical validation.
 # We bin the data into 5-minute intervals.
 # Calculation: 5 mins / 1440 mins_per_day = 0.00347 days
-lc_folded_binned = lc_folded_raw.bin(time_bin_size=5/1440) 
+# Only the columns exported to the CSV are binned, in a single vectorized pass.
+bin_phase, flux_val, flux_err = bin_phase_curve(
+    lc_folded_raw.time.value,
+    lc_folded_raw.flux.value,
+    lc_folded_raw.flux_err.value,
+    bin_size=5/1440,
+)
 
 # Step 3: CRITICAL - Unit Conversion (Phase -> Days)
 # Lightkurve returns 'phase' (dimensionless, -0.5 to 0.5). 
 # Triceratops expects time units (days relative to transit center).
-time_in_days = lc_folded_binned.time.value * P_ORB
-flux_val = lc_folded_binned.flux.value
-flux_err = lc_folded_binned.flux_err.value
+time_in_days = bin_phase * P_ORB
 
 # --- 5. EXPORT TO CSV ---
 df = pd.DataFrame({
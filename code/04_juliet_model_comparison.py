@@ -12,15 +12,20 @@ import os
 import sys
 import shutil  # Required to delete old folders
 import copy    # Required to safely copy dictionaries
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 # --- WINDOWS MULTIPROCESSING FIX ---
 if 'HOME' not in os.environ:
     os.environ['HOME'] = os.environ['USERPROFILE']
 
+# Parallelism comes from the dynesty worker processes: keep BLAS/OpenMP single-threaded
+# inside each of them (must be set before numpy is imported) to avoid oversubscription.
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+
 import juliet
 import numpy as np
-import lightkurve as lk
-import astropy.units as u
+from pipeline_utils import load_spoc_lightcurve, bin_phase_curve
 
 # =============================================================================
 #  SECTION 1: GLOBAL VARIABLES (USER DEFINED)
@@ -39,14 +44,83 @@ P_PERIOD = 0.52067
 # This is used to center the transit at phase 0.0.
 T0_OLD = 1411.1454 
 
+# 4. CPU CORES for nested sampling
+# Dynesty evaluates live-point proposals in parallel across this many processes.
+N_THREADS = os.cpu_count() or 1
+
+# 5. EARLY EXIT (coarse evidence first)
+# Both models are first fitted with a loose dynesty stopping tolerance: dlogz for the static
+# PLANET fit, and for the dynamic BINARY fit only its initial run (dlogz_init, no extra
+# batches). The evidence left unsampled in each fit is then about COARSE_DLOGZ at most, so
+# the refined fits (default tolerance) are only run when that could move DELTA lnZ across
+# the +/- BAYES_THRESHOLD decision limits.
+COARSE_DLOGZ = 2.0
+BAYES_THRESHOLD = 5.0
+
+# 6. BINARY FIT: maximum number of dynamic nested sampling batches after the initial run
+EB_MAX_BATCH = 10
+
+
+def run_model(priors, tim, fl, fle, out_folder, nthreads, sampler='dynesty', **fit_kwargs):
+    """
+    Fits the light curve with the given priors and returns the log-evidence (lnZ).
+    Extra keyword arguments are forwarded to juliet's fit() (and from there to dynesty).
+    Defined at module level so that it can be executed in a separate process.
+    """
+    dataset = juliet.load(priors=priors, t_lc=tim, y_lc=fl, yerr_lc=fle, out_folder=out_folder)
+    # With nthreads > 1 juliet hands dynesty a process pool (queue_size = nthreads).
+    # juliet's fit() already sets sample='rwalk' and bound='multi' for both dynesty samplers;
+    # they are repeated here to keep the sampler configuration explicit. The bound keyword
+    # only reaches the dynamic sampler: dynesty 3's NestedSampler defines __new__ instead of
+    # __init__, so juliet's keyword filter drops it for the static fit (juliet's own 'multi'
+    # still applies there).
+    results = dataset.fit(sampler=sampler, nthreads=nthreads, bound='multi', sample='rwalk', **fit_kwargs)
+
+    # Retrieve Log-Evidence (lnZ)
+    try:
+        return results.posteriors['lnZ']
+    except KeyError:
+        # Fallback for different juliet versions
+        return results.posteriors['lnZ_dynesty']
+
+
+def compare_models(priors_P, priors_EB, tim, fl, fle, folder_suffix, dlogz=None):
+    """
+    Runs the PLANET and BINARY fits at the same time in two processes (separate
+    out_folders), sharing the available cores, and returns (lnZ_P, lnZ_EB).
+    dlogz is the dynesty stopping tolerance (None keeps the juliet/dynesty default).
+    """
+    threads_per_fit = max(1, N_THREADS // 2)
+    kwargs_P, kwargs_EB = {}, {}
+    if dlogz is not None:
+        kwargs_P['dlogz'] = dlogz
+        kwargs_EB['dlogz_init'] = dlogz  # Dynamic sampler: tolerance of the initial run
+        kwargs_EB['maxbatch'] = 0  # ...and no dynamic batches, so the coarse fit stays cheap
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        future_P = executor.submit(run_model, priors_P, tim, fl, fle, 'results_planet' + folder_suffix,
+                                   threads_per_fit, **kwargs_P)
+        # The BINARY fit (looser priors) dominates the runtime: use dynamic nested sampling.
+        # pfrac=0.0 spends all the extra live points on the evidence, the only output we need,
+        # and stops on the evidence error alone (dynesty's default stopping rule would keep
+        # adding batches until it has 10k effective posterior samples). maxbatch caps the cost.
+        kwargs_EB.setdefault('maxbatch', EB_MAX_BATCH)
+        future_EB = executor.submit(run_model, priors_EB, tim, fl, fle, 'results_binary' + folder_suffix,
+                                    threads_per_fit, sampler='dynamic_dynesty', wt_kwargs={'pfrac': 0.0},
+                                    stop_kwargs={'pfrac': 0.0}, **kwargs_EB)
+        return future_P.result(), future_EB.result()
+
+
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # Required for frozen executables on Windows
     
     print("=================================================================")
     print(f"  ROBUST VALIDATION - {ID}")
     print("=================================================================")
 
     # --- AUTOMATIC CLEANUP (Prevents 'KeyError' or data mixing) ---
-    folders_to_clean = ['results_planet_full', 'results_binary_full']
+    folders_to_clean = ['results_planet_coarse', 'results_binary_coarse',
+                        'results_planet_full', 'results_binary_full']
     print("\n[0/5] Cleaning old results to avoid conflicts...")
     for folder in folders_to_clean:
         if os.path.exists(folder):
@@ -61,13 +135,8 @@ if __name__ == '__main__':
     # =========================================================================
     print("\n[1/5] Downloading and Processing data...")
     try:
-        # Search for TESS SPOC data
-        search_result = lk.search_lightcurve(ID, mission="TESS", author="SPOC")
-        if len(search_result) == 0: 
-            search_result = lk.search_lightcurve(ID, mission="TESS")
-        
-        print(f"       -> Found {len(search_result)} files. Stitching...")
-        lc_raw = search_result.download_all().stitch().remove_nans()
+        # TESS SPOC data (downloaded once, then read from the local 'data/' cache)
+        lc_raw = load_spoc_lightcurve(ID).remove_nans()
         
         # --- FOLDING ---
         # We fold the light curve using YOUR derived Period and T0.
@@ -75,16 +144,17 @@ if __name__ == '__main__':
         lc_folded = lc_raw.fold(period=P_PERIOD, epoch_time=T0_OLD)
         
         # --- BINNING ---
-        # [GUIDE]: 'time_bin_size' reduces noise and computation time.
-        # - For normal transits (>2h): 5*u.min or 10*u.min is fine.
-        # - For very short/fast transits (<1h): Use 2*u.min to preserve shape.
-        lc_binned = lc_folded.bin(time_bin_size=5*u.min)
-        lc_final = lc_binned.remove_nans()
-
-        # Extract arrays for Juliet
-        times = lc_final.time.value 
-        flux = lc_final.flux.value
-        flux_err = lc_final.flux_err.value
+        # [GUIDE]: 'bin_size' (days) reduces noise and computation time.
+        # - For normal transits (>2h): 5 or 10 minutes is fine.
+        # - For very short/fast transits (<1h): Use 2 minutes to preserve shape.
+        # Only the flux is binned (empty bins are dropped).
+        times, flux, _ = bin_phase_curve(lc_folded.time.value, lc_folded.flux.value, bin_size=5/1440)
+
+        # Per-point error: scatter of the out-of-transit bins (|t| > 0.05 d).
+        # Juliet fits a jitter term (sigma_w_TESS) on top of it, so per-bin
+        # propagated errors are not needed.
+        out_of_transit = np.abs(times) > 0.05
+        flux_err = np.full_like(flux, np.nanstd(flux[out_of_transit]))
         
         print(f"       -> Data processed successfully. Points available: {len(times)}")
 
@@ -93,10 +163,11 @@ if __name__ == '__main__':
         sys.exit(1)
 
     # Prepare dictionaries for Juliet
+    # (times are already sorted by the binning; contiguous float64 avoids copies in juliet/batman)
     tim, fl, fle = {}, {}, {}
-    tim['TESS'] = np.array(times)
-    fl['TESS'] = np.array(flux)
-    fle['TESS'] = np.array(flux_err)
+    tim['TESS'] = np.ascontiguousarray(times, dtype=np.float64)
+    fl['TESS'] = np.ascontiguousarray(flux, dtype=np.float64)
+    fle['TESS'] = np.ascontiguousarray(flux_err, dtype=np.float64)
 
     # =========================================================================
     #  SECTION 3: CONFIGURE PLANET MODEL
@@ -146,15 +217,10 @@ if __name__ == '__main__':
     priors['mflux_TESS'] = {'distribution': 'normal', 'hyperparameters': [0.0, 0.1]}
     priors['sigma_w_TESS'] = {'distribution': 'loguniform', 'hyperparameters': [0.1, 10000]}
 
-    # RUN PLANET MODEL
-    print("\n[3/5] Running PLANET Model...")
-    dataset_P = juliet.load(priors=priors, t_lc=tim, y_lc=fl, yerr_lc=fle, out_folder='results_planet_full')
-    results_P = dataset_P.fit(sampler='dynesty', nthreads=1) 
-
     # =========================================================================
     #  SECTION 4: CONFIGURE BINARY MODEL (EB)
     # =========================================================================
-    print("\n[4/5] Running BINARY Model (EB)...")
+    print("\n[3/5] Configuring Priors (BINARY Model)...")
     
     # Deepcopy to modify priors without affecting the original dictionary
     priors_EB = copy.deepcopy(priors)
@@ -172,38 +238,40 @@ if __name__ == '__main__':
     # [BINARY MODEL]: The companion can be as large as the host star (p=1.0).
     priors_EB['p_p1'] = {'distribution': 'uniform', 'hyperparameters': [0.0, 1.0]} 
 
-    # RUN BINARY MODEL
-    dataset_EB = juliet.load(priors=priors_EB, t_lc=tim, y_lc=fl, yerr_lc=fle, out_folder='results_binary_full')
-    results_EB = dataset_EB.fit(sampler='dynesty', nthreads=1)
+    # RUN BOTH MODELS
+    # The two fits are independent: run them at the same time (see compare_models).
+    print(f"\n[4/5] Running PLANET and BINARY Models concurrently (coarse, dlogz={COARSE_DLOGZ})...")
+    lnZ_P, lnZ_EB = compare_models(priors, priors_EB, tim, fl, fle, '_coarse', dlogz=COARSE_DLOGZ)
+    delta_coarse = lnZ_P - lnZ_EB
+    stage = f"coarse fits (dlogz={COARSE_DLOGZ}, results_*_coarse)"
+
+    if abs(abs(delta_coarse) - BAYES_THRESHOLD) < COARSE_DLOGZ:
+        print(f"       -> Coarse DELTA lnZ = {delta_coarse:.2f} is close to the decision limit. Refining both fits...")
+        lnZ_P, lnZ_EB = compare_models(priors, priors_EB, tim, fl, fle, '_full')
+        stage = "refined fits (results_*_full)"
+    else:
+        print(f"       -> Coarse DELTA lnZ = {delta_coarse:.2f} already decides the verdict. Skipping refinement.")
 
     # =========================================================================
     #  SECTION 5: FINAL COMPARISON
     # =========================================================================
     print("\n[5/5] FINAL VERDICT")
-    
-    # Retrieve Log-Evidence (lnZ)
-    try:
-        lnZ_P = results_P.posteriors['lnZ']
-        lnZ_EB = results_EB.posteriors['lnZ']
-    except KeyError:
-        # Fallback for different juliet versions
-        lnZ_P = results_P.posteriors['lnZ_dynesty']
-        lnZ_EB = results_EB.posteriors['lnZ_dynesty']
 
     delta = lnZ_P - lnZ_EB
 
     print(f"---------------------------------------")
+    print(f"Evidences from the {stage}")
     print(f"Planet Evidence (lnZ_P): {lnZ_P:.2f}")
     print(f"Binary Evidence (lnZ_EB): {lnZ_EB:.2f}")
     print(f"DELTA lnZ (P - EB):      {delta:.2f}")
     print(f"---------------------------------------")
     
     # INTERPRETATION OF RESULTS
-    if delta > 5:
+    if delta > BAYES_THRESHOLD:
         print("RESULT: Strong evidence for PLANET model.")
-    elif delta < -5:
+    elif delta < -BAYES_THRESHOLD:
         print("RESULT: Strong evidence for ECLIPSING BINARY model.")
     else:
-        print("RESULT: Inconclusive (|Delta| < 5).")
+        print(f"RESULT: Inconclusive (|Delta| < {BAYES_THRESHOLD:.0f}).")
         print("        Note: For very shallow/low-SNR signals, this is the expected result.")
         print("        It means the data isn't precise enough to distinguish the shapes.")
\ No newline at end of file
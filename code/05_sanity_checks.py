@@ -11,12 +11,10 @@ Author: Biel Escolà Rodrigo
 Target: TOI 864.01 (TIC 231728511)
 """
 
-import lightkurve as lk
 import numpy as np
 import matplotlib.pyplot as plt
-import astropy.units as u
-from astropy.constants import G, R_sun, M_sun
 import os
+from pipeline_utils import load_spoc_lightcurve
 
 # --- TARGET PARAMETERS (TOI 864.01) ---
 ID = "TIC 231728511"
@@ -24,11 +22,33 @@ PERIOD = 0.52067
 T0 = 1411.1454
 DURATION_HOURS = 1.0  # Approx duration for masking purposes
 
+# --- PHYSICAL CONSTANTS (CGS, same values as astropy.constants) ---
+G_CGS = 6.6743e-8              # cm^3 g^-1 s^-2
+M_SUN_G = 1.988409870698051e33 # g
+R_SUN_CM = 6.957e10            # cm
+AU_CM = 1.495978707e13         # cm
+SEC_PER_DAY = 86400.0
+
 # Output directory for figures
 OUTPUT_DIR = "figures"
 if not os.path.exists(OUTPUT_DIR):
     os.makedirs(OUTPUT_DIR)
 
+def transit_depth(binned_lc, window_in=0.02, window_out=0.03):
+    """
+    Depth of a binned, folded light curve: median flux out-of-transit (|t| > window_out)
+    minus median flux in-transit (|t| < window_in), in one pass over its own arrays.
+    Also returns the uncertainty: std of the out-of-transit flux / sqrt(N in-transit).
+    """
+    flux = binned_lc.flux.value
+    abs_time = np.abs(binned_lc.time.value)
+    flux_in = flux[abs_time < window_in]
+    flux_out = flux[abs_time > window_out]
+
+    depth = np.median(flux_out) - np.median(flux_in)
+    sigma = np.std(flux_out) / np.sqrt(len(flux_in))
+    return depth, sigma
+
 print("=======================================================")
 print("  SANITY CHECKS: ODD-EVEN & DENSITY - TOI 864.01")
 print("=======================================================\n")
@@ -36,13 +56,8 @@ print("=======================================================\n")
 # 1. DATA RETRIEVAL AND PREPARATION
 print("[1/3] Downloading and processing TESS data...")
 try:
-    # Search for high-quality SPOC data first
-    search = lk.search_lightcurve(ID, mission="TESS", author="SPOC")
-    if len(search) == 0:
-        search = lk.search_lightcurve(ID, mission="TESS")
-    
-    # Download, stitch, and clean
-    lc = search.download_all().stitch().remove_nans()
+    # High-quality SPOC data first (downloaded once, then read from the local 'data/' cache)
+    lc = load_spoc_lightcurve(ID).remove_nans()
     print(f"      -> Data loaded successfully: {len(lc)} data points.")
 
 except Exception as e:
@@ -52,34 +67,33 @@ except Exception as e:
 # 2. ODD-EVEN TRANSIT TEST
 print("\n[2/3] Executing Odd-Even Transit Test...")
 
-# Identify odd and even transits based on the original time array
+# Fold once; the odd/even split is then done on the folded light curve
+lc_folded = lc.fold(period=PERIOD, epoch_time=T0)
+
+# Identify odd and even transits based on the original (unfolded) times
 # Calculate approximate orbit number
-orbit_num = np.round((lc.time.value - T0) / PERIOD).astype(int)
+orbit_num = np.rint((lc_folded.time_original.value - T0) * (1.0 / PERIOD)).astype(np.int32)
 
 # Create masks for separation
-mask_even = (orbit_num % 2 == 0)
-mask_odd = (orbit_num % 2 != 0)
+mask_odd = (orbit_num & 1).astype(bool)
+mask_even = ~mask_odd
 
-# Create two separate folded light curves
-lc_even = lc[mask_even].fold(period=PERIOD, epoch_time=T0)
-lc_odd = lc[mask_odd].fold(period=PERIOD, epoch_time=T0)
+# Two folded light curves (even / odd orbits)
+lc_even = lc_folded[mask_even]
+lc_odd = lc_folded[mask_odd]
 
 # Bin data to reduce noise and visualize depth clearly
-bin_even = lc_even.bin(time_bin_size=10*u.min)
-bin_odd = lc_odd.bin(time_bin_size=10*u.min)
+# (10 min = 10/1440 days)
+bin_even = lc_even.bin(time_bin_size=10/1440)
+bin_odd = lc_odd.bin(time_bin_size=10/1440)
 
 # Calculate approximate depth (Median flux out-of-transit vs in-transit)
-# Define transit window: +/- 0.02 days
-transit_mask_ev = (np.abs(bin_even.time.value) < 0.02)
-out_mask_ev = (np.abs(bin_even.time.value) > 0.03)
-
-depth_even = np.median(bin_even.flux.value[out_mask_ev]) - np.median(bin_even.flux.value[transit_mask_ev])
-depth_odd = np.median(bin_odd.flux.value[out_mask_ev]) - np.median(bin_odd.flux.value[transit_mask_ev])
+# Define transit window: +/- 0.02 days (out-of-transit beyond 0.03 days)
+# Simple error estimation using standard deviation of out-of-transit flux
+depth_even, sigma_even = transit_depth(bin_even)
+depth_odd, sigma_odd = transit_depth(bin_odd)
 
 # Calculate significance of the difference (in sigma)
-# Simple error estimation using standard deviation of out-of-transit flux
-sigma_even = np.std(bin_even.flux.value[out_mask_ev]) / np.sqrt(len(bin_even.flux.value[transit_mask_ev]))
-sigma_odd = np.std(bin_odd.flux.value[out_mask_ev]) / np.sqrt(len(bin_odd.flux.value[transit_mask_ev]))
 sigma_diff = np.sqrt(sigma_even**2 + sigma_odd**2)
 
 diff_sigma = np.abs(depth_even - depth_odd) / sigma_diff
@@ -101,22 +115,17 @@ R_star_val = 0.399  # R_sun
 M_star_val = 0.380  # M_sun (Typical estimate for R=0.4 if exact mass unavailable)
 
 # Calculate Catalog Density (g/cm^3)
-rho_star_cat = (M_star_val * M_sun) / ((4/3) * np.pi * (R_star_val * R_sun)**3)
-rho_star_cat_cgs = rho_star_cat.to(u.g / u.cm**3).value
+rho_star_cat_cgs = (M_star_val * M_SUN_G) / ((4/3) * np.pi * (R_star_val * R_SUN_CM)**3)
 
 # Calculate Transit-Derived Density (Seager & Mallen-Ornelas 2003)
 # We need a/R* (derived from the period and stellar radius for a circular orbit)
 # Assuming a ~ 0.0093 AU and R* ~ 0.399 R_sun:
-a_au = 0.0093 * u.AU
-r_star_au = (0.399 * R_sun).to(u.AU)
-a_over_r = (a_au / r_star_au).value
+a_over_r = (0.0093 * AU_CM) / (0.399 * R_SUN_CM)
 
 # Formula: rho_circ = (3 pi / G P^2) * (a/R*)^3
-G_cgs = G.to(u.cm**3 / (u.g * u.s**2))
-P_sec = (PERIOD * u.day).to(u.s)
+P_sec = PERIOD * SEC_PER_DAY
 
-rho_transit = (3 * np.pi / (G_cgs * P_sec**2)) * (a_over_r)**3
-rho_transit_val = rho_transit.value
+rho_transit_val = (3 * np.pi / (G_CGS * P_sec**2)) * (a_over_r)**3
 
 print(f"   -> Catalog Density (TIC v8):   {rho_star_cat_cgs:.2f} g/cm^3")
 print(f"   -> Transit-Derived Density:    {rho_transit_val:.2f} g/cm^3 (assuming a/R* ~ {a_over_r:.1f})")
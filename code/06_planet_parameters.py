@@ -10,6 +10,11 @@ Target: TOI 864.01
 
 import numpy as np
 from astroquery.mast import Catalogs
+from cache_utils import load_cached_table
+
+# --- 0. CONSTANTS ---
+R_SUN_IN_R_EARTH = 109.076   # 1 R_sun in Earth radii
+AU_IN_R_SUN = 215.032        # 1 AU in solar radii
 
 # --- 1. INPUT DATA (From Analysis) ---
 TIC_ID = "231728511"
@@ -24,7 +29,11 @@ print("---------------------------------------------")
 # --- 2. RETRIEVING STELLAR DATA ---
 print("📡 Retrieving stellar parameters (TIC v8)...")
 
-catalog_data = Catalogs.query_object(f"TIC {TIC_ID}", catalog="TIC")
+# The TIC row is queried once and then read from the local 'data/' cache.
+catalog_data = load_cached_table(
+    f"TIC_{TIC_ID}_catalog",
+    lambda: Catalogs.query_object(f"TIC {TIC_ID}", catalog="TIC")[:1]["ID", "rad", "mass", "Teff"],
+)
 star_radius = catalog_data[0]['rad']   # Solar Radii
 star_mass = catalog_data[0]['mass']    # Solar Masses
 star_temp = catalog_data[0]['Teff']    # Kelvin
@@ -38,8 +47,7 @@ print(f"   Star: R = {star_radius:.3f} R_sol | M = {star_mass:.3f} M_sol | Teff
 # --- 3. PHYSICAL CALCULATIONS ---
 
 # A) PLANETARY RADIUS
-# 1 R_sun = 109.076 R_earth
-planet_radius_earth = (star_radius * 109.076) * np.sqrt(DEPTH_DECIMAL)
+planet_radius_earth = (star_radius * R_SUN_IN_R_EARTH) * np.sqrt(DEPTH_DECIMAL)
 
 # B) SEMI-MAJOR AXIS (a)
 # Kepler's 3rd Law approx
@@ -48,8 +56,7 @@ a_au = ( (period_years**2) * star_mass )**(1/3)
 
 # C) EQUILIBRIUM TEMPERATURE
 # Bond Albedo = 0 assumed
-# 1 AU = 215.032 Solar Radii
-a_rs = a_au * 215.032
+a_rs = a_au * AU_IN_R_SUN
 planet_temp_kelvin = star_temp * np.sqrt(star_radius / (2 * a_rs))
 planet_temp_celsius = planet_temp_kelvin - 273.15
 
@@ -0,0 +1,34 @@
+"""
+cache_utils.py
+--------------
+Local 'data/' cache shared by the analysis scripts in this folder.
+
+Kept free of lightkurve so that scripts which only query catalogs can use it
+without importing the light-curve stack.
+
+Author: Biel Escolà Rodrigo
+Target: TOI 864.01 (TIC 231728511)
+"""
+
+from pathlib import Path
+
+from astropy.table import Table
+
+# Local cache folder (not tracked by git): <repository>/data
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+def load_cached_table(name, fetch):
+    """
+    Returns the table (e.g. a catalog query result) cached as 'data/<name>.ecsv'.
+    On the first run fetch() is called and its result is saved for the next run.
+    """
+    path = DATA_DIR / f"{name}.ecsv"
+    if path.exists():
+        print(f"   -> Loading cached table: {path}")
+        return Table.read(path, format="ascii.ecsv")
+
+    table = fetch()
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    table.write(path, format="ascii.ecsv")
+    return table
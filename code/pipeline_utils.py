@@ -0,0 +1,148 @@
+"""
+pipeline_utils.py
+-----------------
+Shared helpers for the analysis scripts in this folder.
+
+Light curves and target pixel files from MAST are stored once in the
+'data/' folder of the repository and reloaded from disk on later runs, so the
+scripts do not query and download the same sectors again every time they are
+executed.
+
+Author: Biel Escolà Rodrigo
+Target: TOI 864.01 (TIC 231728511)
+"""
+
+import shutil
+
+import numpy as np
+import lightkurve as lk
+from astropy.time import Time
+
+from cache_utils import DATA_DIR
+
+
+def read_cached_lightcurve(name):
+    """Returns the light curve cached as 'data/<name>.npz', or None if it is not cached yet."""
+    path = DATA_DIR / f"{name}.npz"
+    if not path.exists():
+        return None
+
+    print(f"   -> Loading cached light curve: {path}")
+    data = np.load(path)
+    return lk.LightCurve(
+        time=Time(data["time"], format="btjd", scale="tdb"),
+        flux=data["flux"],
+        flux_err=data["flux_err"],
+    )
+
+
+def save_cached_lightcurve(name, lc):
+    """
+    Saves the light curve as 'data/<name>.npz'. Only time (BTJD), flux and flux_err
+    are stored, which are the columns used by the scripts.
+    """
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    np.savez(DATA_DIR / f"{name}.npz", time=lc.time.value, flux=lc.flux.value, flux_err=lc.flux_err.value)
+
+
+def load_cached_lightcurve(name, fetch):
+    """
+    Returns the light curve cached as 'data/<name>.npz'.
+    On the first run fetch() is called to build the light curve (download, stitch...)
+    and the result is saved for the next run.
+    """
+    lc = read_cached_lightcurve(name)
+    if lc is None:
+        lc = fetch()
+        save_cached_lightcurve(name, lc)
+    return lc
+
+
+def load_cached_targetpixelfile(name, fetch):
+    """
+    Returns the target pixel file cached as 'data/<name>_tp.fits'.
+
+    On the first run fetch() is called to download it (it may return None) and
+    the downloaded FITS file is copied to the cache for the next run.
+    """
+    path = DATA_DIR / f"{name}_tp.fits"
+    if path.exists():
+        print(f"   -> Loading cached target pixel file: {path}")
+        return lk.read(path)
+
+    tpf = fetch()
+    if tpf is not None:
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(tpf.path, path)
+    return tpf
+
+
+def bin_phase_curve(phase, flux, flux_err=None, bin_size=0.005):
+    """
+    Bins a phase-folded curve into uniform bins of width bin_size (same units as phase).
+
+    Same convention as LightCurve.bin(): bins start at the first phase value, the binned
+    flux is the mean of each bin and the binned error is sqrt(sum(err**2)) / N.
+    Non-finite points and empty bins are dropped (empty arrays if no point is finite).
+    Returns (bin_centers, binned_flux, binned_err); binned_err is None without flux_err.
+    """
+    phase = np.asarray(phase, dtype=float)
+    flux = np.asarray(flux, dtype=float)
+    good = np.isfinite(phase) & np.isfinite(flux)
+    if flux_err is not None:
+        flux_err = np.asarray(flux_err, dtype=float)
+        good &= np.isfinite(flux_err)
+
+    if not good.any():
+        empty = np.array([])
+        return empty, empty, (None if flux_err is None else empty)
+
+    order = np.argsort(phase[good])
+    phase = phase[good][order]
+    flux = flux[good][order]
+
+    # Bin index of every point (rounded, so that a point on a bin edge is not pushed into
+    # the previous bin by floating-point error), then the first point of every filled bin
+    bin_index = np.floor(np.round((phase - phase[0]) / bin_size, 8)).astype(int)
+    starts = np.flatnonzero(np.r_[True, np.diff(bin_index) > 0])
+    counts = np.diff(np.r_[starts, len(phase)])
+
+    bin_centers = phase[0] + (bin_index[starts] + 0.5) * bin_size
+    binned_flux = np.add.reduceat(flux, starts) / counts
+    binned_err = None
+    if flux_err is not None:
+        flux_err = flux_err[good][order]
+        binned_err = np.sqrt(np.add.reduceat(flux_err**2, starts)) / counts
+
+    return bin_centers, binned_flux, binned_err
+
+
+def download_spoc_lightcurve(target):
+    """
+    Downloads and stitches all TESS SPOC sectors of the target (any TESS author as fallback).
+    Returns (light curve, is_spoc).
+    """
+    # A single MAST query; the SPOC files are then selected locally
+    search = lk.search_lightcurve(target, mission="TESS")
+    search_spoc = search[search.author == "SPOC"]
+    is_spoc = len(search_spoc) > 0
+    if is_spoc:
+        search = search_spoc
+
+    print(f"   -> Found {len(search)} files. Stitching...")
+    return search.download_all().stitch(), is_spoc
+
+
+def load_spoc_lightcurve(target):
+    """
+    Stitched SPOC light curve of the target, downloaded once and then read from 'data/'.
+    Fallback (non-SPOC) light curves are not cached, so SPOC data are picked up as soon
+    as they are available.
+    """
+    name = target.replace(" ", "_") + "_SPOC"
+    lc = read_cached_lightcurve(name)
+    if lc is None:
+        lc, is_spoc = download_spoc_lightcurve(target)
+        if is_spoc:
+            save_cached_lightcurve(name, lc)
+    return lc